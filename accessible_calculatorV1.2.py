@@ -3,17 +3,1368 @@ import pickle
 import os
 import re
 import tempfile
+import shutil
 import math
 import threading
 import keyboard
 import time
+import sys
+import uuid
+import struct
+import ctypes
+import ctypes.util
+import decimal
+import functools
+import itertools
+import statistics
+import array
+import csv
+import json
+import collections
+import datetime
+import argparse
+import bisect
+import heapq
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+HISTORY_FILE_NAME = 'calculator_results.pkl'
+HISTORY_MAGIC = 'accessible-calculator-history'
+HISTORY_VERSION = 1
+MAX_RESULTS = 1000
+COMPACT_THRESHOLD = 64 * 1024
+POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+INOTIFY_EVENT = struct.Struct('iIII')
+
+class FileLock:
+    """Exclusive lock on a side file, shared by every running instance."""
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        else:
+            self.handle.seek(0)
+            msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+def numeric_value(result):
+    """The result as a finite float for statistics, or None if it has no plain numeric value."""
+    if isinstance(result, bool) or not isinstance(result, (int, float, str)):
+        return None
+    try:
+        value = float(result)
+    except (ValueError, OverflowError):
+        return None
+    return value if math.isfinite(value) else None
+
+class RunningStats:
+    """Welford's running mean and variance."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self):
+        return self.m2 / (self.count - 1)
+
+def merge_moments(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    """Mean and sum of squared deviations of two groups combined (Chan et al.).
+
+    Unlike sums of squares this does not cancel when the values are large
+    and close together, and groups are only ever merged, never taken apart.
+    """
+    count = count_a + count_b
+    if not count_b:
+        return mean_a, m2_a
+    if not count_a:
+        return mean_b, m2_b
+    delta = mean_b - mean_a
+    return mean_a + delta * count_b / count, m2_a + m2_b + delta * delta * count_a * count_b / count
+
+BLOCK_SIZE = 64
+KIND_EMPTY = 0
+KIND_FLOAT = 1
+KIND_INT = 2
+KIND_OBJECT = 3
+KIND_NUMERIC_OBJECT = 4
+NUMERIC_KINDS = frozenset((KIND_FLOAT, KIND_INT, KIND_NUMERIC_OBJECT))
+MAX_EXACT_INT = 2 ** 53
+# How each result was evaluated, stored as its position here. Entries from
+# before modes were recorded have ''.
+EVALUATION_MODES = ('', 'standard', 'advanced', 'units', 'statistics')
+MODE_NUMBERS = {mode: number for number, mode in enumerate(EVALUATION_MODES)}
+
+def new_entry_id():
+    return (uuid.uuid4().int >> 65) or 1
+
+def compact_id(entry_id):
+    """Folds the hex ids written by older versions into the 63-bit ids used now."""
+    if isinstance(entry_id, str):
+        return (int(entry_id, 16) >> 65) or 1
+    return entry_id
+
+class HistoryEntry:
+    __slots__ = ('entry_id', 'equation', 'result', 'timestamp', 'mode')
+
+    def __init__(self, entry_id, equation, result, timestamp, mode=''):
+        self.entry_id = entry_id
+        self.equation = equation
+        self.result = result
+        self.timestamp = timestamp
+        self.mode = mode
+
+class HistoryColumns:
+    """History entries stored column by column, with running aggregates.
+
+    Each entry takes a slot in a set of typed arrays (id, timestamp,
+    equation number, kind, value, evaluation mode), oldest first. Equations are stored once
+    in a table and referenced by number; results that fit a double are kept
+    in the value column and only other results (huge ints, quantities) are
+    held as objects. Deleted entries leave empty slots until the arrays fill
+    up and are squeezed.
+
+    A segment tree over blocks of BLOCK_SIZE slots keeps entry counts, sums,
+    means, squared deviations from the mean, min and max, which finds the
+    n-th newest entry and answers "last N" statistics in O(log n +
+    BLOCK_SIZE). The root answers them for the whole history in O(1).
+    Removing an entry rescans its block and merges the nodes above it
+    again, so no total is ever downdated.
+
+    Indexing and iteration go newest first and give (equation, result)
+    pairs, like the list of tuples this replaces.
+    """
+    def __init__(self):
+        self.ids = array.array('q')
+        self.timestamps = array.array('d')
+        self.equation_refs = array.array('I')
+        self.kinds = array.array('B')
+        self.values = array.array('d')
+        self.modes = array.array('B')
+        self.objects = {}
+        self.equations = []
+        self.equation_numbers = {}
+        self.live = 0
+        self._build_tree(1)
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self):
+        return self.live
+
+    def __getitem__(self, index):
+        slot = self._slot(index)
+        return self.equations[self.equation_refs[slot]], self._result(slot)
+
+    def __iter__(self):
+        for slot in range(len(self.kinds) - 1, -1, -1):
+            if self.kinds[slot] != KIND_EMPTY:
+                yield self.equations[self.equation_refs[slot]], self._result(slot)
+
+    def versions(self):
+        """Yields (id, timestamp) per entry, newest first, which changes whenever the entry is added or replaced."""
+        for slot in range(len(self.kinds) - 1, -1, -1):
+            if self.kinds[slot] != KIND_EMPTY:
+                yield self.ids[slot], self.timestamps[slot]
+
+    def entry(self, index):
+        return self._entry(self._slot(index))
+
+    def entry_id(self, index):
+        return self.ids[self._slot(index)]
+
+    def oldest_first(self):
+        """Yields a HistoryEntry per entry, oldest first."""
+        for slot in range(len(self.kinds)):
+            if self.kinds[slot] != KIND_EMPTY:
+                yield self._entry(slot)
+
+    def snapshot(self):
+        """A copy of the entry columns that another thread can read while this one changes.
+
+        Copying the arrays is a memcpy and the equation table a copy of its
+        references. The aggregate tree is left out.
+        """
+        copy = HistoryColumns.__new__(HistoryColumns)
+        copy.ids = self.ids[:]
+        copy.timestamps = self.timestamps[:]
+        copy.equation_refs = self.equation_refs[:]
+        copy.kinds = self.kinds[:]
+        copy.values = self.values[:]
+        copy.modes = self.modes[:]
+        copy.objects = dict(self.objects)
+        copy.equations = self.equations[:]
+        copy.live = self.live
+        return copy
+
+    def add(self, entry_id, equation, result, timestamp, mode=''):
+        if len(self.kinds) == self.blocks * BLOCK_SIZE:
+            self._squeeze()
+        slot = len(self.kinds)
+        kind, value = self._encode(slot, result)
+        self.ids.append(entry_id)
+        self.timestamps.append(timestamp)
+        self.equation_refs.append(self._equation_number(equation))
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.modes.append(MODE_NUMBERS[mode])
+        self.live += 1
+        numeric = kind in NUMERIC_KINDS
+        # Appending only ever adds to the totals on the path, so the block
+        # does not need to be rescanned.
+        node = self.blocks + slot // BLOCK_SIZE
+        while node:
+            self.node_entries[node] += 1
+            if numeric:
+                self.node_counts[node] += 1
+                self.node_sums[node] += value
+                delta = value - self.node_means[node]
+                self.node_means[node] += delta / self.node_counts[node]
+                self.node_m2s[node] += delta * (value - self.node_means[node])
+                self.node_mins[node] = min(self.node_mins[node], value)
+                self.node_maxs[node] = max(self.node_maxs[node], value)
+            node //= 2
+
+    def replace(self, entry_id, equation, result, timestamp, mode=''):
+        slot = self._find(entry_id)
+        if slot is None:
+            return False
+        self._forget(slot)
+        kind, value = self._encode(slot, result)
+        self.timestamps[slot] = timestamp
+        self.equation_refs[slot] = self._equation_number(equation)
+        self.kinds[slot] = kind
+        self.values[slot] = value
+        self.modes[slot] = MODE_NUMBERS[mode]
+        self._update_block(slot // BLOCK_SIZE)
+        return True
+
+    def remove(self, entry_id):
+        slot = self._find(entry_id)
+        if slot is None:
+            return False
+        self._remove_slot(slot)
+        return True
+
+    def remove_oldest(self):
+        self._remove_slot(self._slot(self.live - 1))
+
+    def _remove_slot(self, slot):
+        self._forget(slot)
+        self.ids[slot] = 0
+        self.kinds[slot] = KIND_EMPTY
+        self.live -= 1
+        self._update_block(slot // BLOCK_SIZE)
+
+    def _forget(self, slot):
+        self.objects.pop(slot, None)
+
+    def _find(self, entry_id):
+        try:
+            return self.ids.index(entry_id)
+        except ValueError:
+            return None
+
+    def _equation_number(self, equation):
+        number = self.equation_numbers.get(equation)
+        if number is None:
+            number = len(self.equations)
+            self.equations.append(equation)
+            self.equation_numbers[equation] = number
+        return number
+
+    def _encode(self, slot, result):
+        # inf and nan are kept as objects, so they never reach the totals.
+        if type(result) is float and math.isfinite(result):
+            return KIND_FLOAT, result
+        if type(result) is int and -MAX_EXACT_INT <= result <= MAX_EXACT_INT:
+            return KIND_INT, float(result)
+        self.objects[slot] = result
+        value = numeric_value(result)
+        if value is None:
+            return KIND_OBJECT, 0.0
+        return KIND_NUMERIC_OBJECT, value
+
+    def _result(self, slot):
+        kind = self.kinds[slot]
+        if kind == KIND_FLOAT:
+            return self.values[slot]
+        if kind == KIND_INT:
+            return int(self.values[slot])
+        return self.objects[slot]
+
+    def _entry(self, slot):
+        return HistoryEntry(self.ids[slot], self.equations[self.equation_refs[slot]], self._result(slot), self.timestamps[slot],
+                            EVALUATION_MODES[self.modes[slot]])
+
+    def _build_tree(self, blocks):
+        self.blocks = blocks
+        self.node_entries = array.array('q', [0]) * (2 * blocks)
+        self.node_counts = array.array('q', [0]) * (2 * blocks)
+        self.node_sums = array.array('d', [0.0]) * (2 * blocks)
+        self.node_means = array.array('d', [0.0]) * (2 * blocks)
+        self.node_m2s = array.array('d', [0.0]) * (2 * blocks)
+        self.node_mins = array.array('d', [math.inf]) * (2 * blocks)
+        self.node_maxs = array.array('d', [-math.inf]) * (2 * blocks)
+
+    def _squeeze(self):
+        """Drops empty slots and unused equations, and doubles the tree if the entries still fill half of it."""
+        slots = [slot for slot in range(len(self.kinds)) if self.kinds[slot] != KIND_EMPTY]
+        objects = self.objects
+        self.objects = {}
+        for new_slot, slot in enumerate(slots):
+            if slot in objects:
+                self.objects[new_slot] = objects[slot]
+        self.ids = array.array('q', (self.ids[slot] for slot in slots))
+        self.timestamps = array.array('d', (self.timestamps[slot] for slot in slots))
+        # Renumber the equations the remaining entries refer to, so that the
+        # table does not keep every equation ever entered.
+        numbers = {}
+        equations = []
+        equation_refs = array.array('I')
+        for slot in slots:
+            ref = self.equation_refs[slot]
+            number = numbers.get(ref)
+            if number is None:
+                number = numbers[ref] = len(equations)
+                equations.append(self.equations[ref])
+            equation_refs.append(number)
+        self.equations = equations
+        self.equation_numbers = {equation: number for number, equation in enumerate(equations)}
+        self.equation_refs = equation_refs
+        self.kinds = array.array('B', (self.kinds[slot] for slot in slots))
+        self.values = array.array('d', (self.values[slot] for slot in slots))
+        self.modes = array.array('B', (self.modes[slot] for slot in slots))
+        blocks = self.blocks * 2 if len(slots) > self.blocks * BLOCK_SIZE // 2 else self.blocks
+        self._build_tree(blocks)
+        for block in range((len(slots) + BLOCK_SIZE - 1) // BLOCK_SIZE):
+            self._update_leaf(block)
+        for node in range(blocks - 1, 0, -1):
+            self._update_node(node)
+
+    def _update_block(self, block):
+        self._update_leaf(block)
+        node = (self.blocks + block) // 2
+        while node:
+            self._update_node(node)
+            node //= 2
+
+    def _update_leaf(self, block):
+        totals = [0, 0, 0.0, 0.0, 0.0, math.inf, -math.inf]
+        start = block * BLOCK_SIZE
+        self._scan(start, min(start + BLOCK_SIZE, len(self.kinds)), totals)
+        node = self.blocks + block
+        (self.node_entries[node], self.node_counts[node], self.node_sums[node], self.node_means[node],
+         self.node_m2s[node], self.node_mins[node], self.node_maxs[node]) = totals
+
+    def _update_node(self, node):
+        left, right = 2 * node, 2 * node + 1
+        self.node_entries[node] = self.node_entries[left] + self.node_entries[right]
+        self.node_counts[node] = self.node_counts[left] + self.node_counts[right]
+        self.node_sums[node] = self.node_sums[left] + self.node_sums[right]
+        self.node_means[node], self.node_m2s[node] = merge_moments(
+            self.node_counts[left], self.node_means[left], self.node_m2s[left],
+            self.node_counts[right], self.node_means[right], self.node_m2s[right])
+        self.node_mins[node] = min(self.node_mins[left], self.node_mins[right])
+        self.node_maxs[node] = max(self.node_maxs[left], self.node_maxs[right])
+
+    def _scan(self, start, end, totals):
+        for slot in range(start, end):
+            kind = self.kinds[slot]
+            if kind == KIND_EMPTY:
+                continue
+            totals[0] += 1
+            if kind in NUMERIC_KINDS:
+                value = self.values[slot]
+                totals[1] += 1
+                totals[2] += value
+                delta = value - totals[3]
+                totals[3] += delta / totals[1]
+                totals[4] += delta * (value - totals[3])
+                totals[5] = min(totals[5], value)
+                totals[6] = max(totals[6], value)
+
+    def _add_node(self, node, totals):
+        totals[0] += self.node_entries[node]
+        totals[3], totals[4] = merge_moments(totals[1], totals[3], totals[4],
+                                             self.node_counts[node], self.node_means[node], self.node_m2s[node])
+        totals[1] += self.node_counts[node]
+        totals[2] += self.node_sums[node]
+        totals[5] = min(totals[5], self.node_mins[node])
+        totals[6] = max(totals[6], self.node_maxs[node])
+
+    def _slot(self, index):
+        """Slot of the entry at position index, counting from the newest."""
+        if not 0 <= index < self.live:
+            raise IndexError("history index out of range")
+        remaining = index + 1
+        node = 1
+        while node < self.blocks:
+            right = 2 * node + 1
+            if self.node_entries[right] >= remaining:
+                node = right
+            else:
+                remaining -= self.node_entries[right]
+                node = 2 * node
+        start = (node - self.blocks) * BLOCK_SIZE
+        for slot in range(min(start + BLOCK_SIZE, len(self.kinds)) - 1, start - 1, -1):
+            if self.kinds[slot] != KIND_EMPTY:
+                remaining -= 1
+                if remaining == 0:
+                    return slot
+        raise IndexError("history index out of range")
+
+    def summary(self, last=None):
+        """Count, sum, mean, min, max and sample variance of the numeric results."""
+        if last is None:
+            count, total, mean, m2 = self.node_counts[1], self.node_sums[1], self.node_means[1], self.node_m2s[1]
+            minimum, maximum = self.node_mins[1], self.node_maxs[1]
+        else:
+            start = self._slot(last - 1) if last < self.live else 0
+            totals = [0, 0, 0.0, 0.0, 0.0, math.inf, -math.inf]
+            block_end = min((start // BLOCK_SIZE + 1) * BLOCK_SIZE, len(self.kinds))
+            self._scan(start, block_end, totals)
+            low = self.blocks + start // BLOCK_SIZE + 1
+            high = 2 * self.blocks
+            while low < high:
+                if low & 1:
+                    self._add_node(low, totals)
+                    low += 1
+                if high & 1:
+                    high -= 1
+                    self._add_node(high, totals)
+                low //= 2
+                high //= 2
+            _, count, total, mean, m2, minimum, maximum = totals
+        if not count:
+            raise ValueError("empty history")
+        variance = m2 / (count - 1) if count > 1 else None
+        return {
+            'count': count, 'sum': total, 'mean': mean, 'min': minimum, 'max': maximum,
+            'variance': variance, 'stdev': math.sqrt(variance) if variance is not None else None,
+        }
+
+    def memory_usage(self):
+        """Approximate bytes held by the history, for the log."""
+        columns = (self.ids, self.timestamps, self.equation_refs, self.kinds, self.values, self.modes,
+                   self.node_entries, self.node_counts, self.node_sums, self.node_means, self.node_m2s, self.node_mins, self.node_maxs)
+        size = sum(column.buffer_info()[1] * column.itemsize for column in columns)
+        size += sys.getsizeof(self.objects) + sum(sys.getsizeof(result) for result in self.objects.values())
+        size += sys.getsizeof(self.equations) + sys.getsizeof(self.equation_numbers)
+        size += sum(sys.getsizeof(equation) for equation in self.equations)
+        return size
+
+def summarize_results(results):
+    """The same figures as HistoryColumns.summary, computed directly for a few chosen results."""
+    running = RunningStats()
+    values = []
+    for result in results:
+        value = numeric_value(result)
+        if value is not None:
+            running.add(value)
+            values.append(value)
+    if not values:
+        raise ValueError("empty history")
+    variance = running.variance() if running.count > 1 else None
+    return {
+        'count': running.count, 'sum': math.fsum(values), 'mean': running.mean, 'min': min(values), 'max': max(values),
+        'variance': variance, 'stdev': math.sqrt(variance) if variance is not None else None,
+    }
+
+class HistoryStore:
+    """Results history kept in an append-only log shared between instances.
+
+    The file starts with a header record carrying a generation token,
+    followed by one pickled operation per change. Each instance remembers
+    the offset it has read up to and only loads the records appended after
+    it. When the log grows well past its last compacted size it is
+    rewritten under a new generation, which tells the other instances to
+    reload it once.
+    """
+    def __init__(self, file_path, max_results=MAX_RESULTS):
+        self.file_path = file_path
+        self.lock_path = file_path + '.lock'
+        self.max_results = max_results
+        self.entries = HistoryColumns()
+        self.generation = None
+        self.offset = 0
+        self.compacted_offset = 0
+
+    def sync(self):
+        """Merges records written since the last sync. Returns True if the history changed."""
+        with FileLock(self.lock_path):
+            return self._read_new_records()
+
+    def add(self, equation, result, mode=''):
+        self._append(('add', new_entry_id(), equation, result, time.time(), mode))
+
+    def replace(self, entry_id, equation, result, mode=''):
+        self._append(('edit', entry_id, equation, result, time.time(), mode))
+
+    def delete(self, entry_id):
+        self._append(('delete', entry_id))
+
+    def clear(self):
+        self._append(('clear',))
+
+    def add_many(self, rows):
+        """Adds (equation, result, timestamp, mode) rows under a single lock, e.g. for an import.
+
+        The rows become the newest entries whatever their timestamps, since
+        the log and the columns only ever append.
+        """
+        self._append(*[('add', new_entry_id(), equation, result, timestamp, mode) for equation, result, timestamp, mode in rows])
+
+    def _append(self, *records):
+        with FileLock(self.lock_path):
+            self._read_new_records()
+            if self.generation is None:
+                self._compact()
+            with open(self.file_path, 'ab') as f:
+                for record in records:
+                    pickle.dump(record, f)
+                self.offset = f.tell()
+            for record in records:
+                self._apply(record)
+            if self.offset > 2 * self.compacted_offset + COMPACT_THRESHOLD:
+                self._compact()
+
+    def _read_new_records(self):
+        try:
+            f = open(self.file_path, 'rb')
+        except FileNotFoundError:
+            changed = bool(self.entries)
+            self._reset(None)
+            return changed
+
+        with f:
+            try:
+                header = pickle.load(f)
+            except (pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+                header = None
+
+            if isinstance(header, list):
+                print("Migrating results file to the shared history format")
+                self._reset(None)
+                for equation, result in reversed(header):
+                    self._apply(('add', new_entry_id(), equation, result, 0.0))
+                f.close()
+                self._compact()
+                return True
+
+            if not (isinstance(header, tuple) and len(header) == 3 and header[0] == HISTORY_MAGIC):
+                changed = bool(self.entries)
+                self._reset(None)
+                return changed
+
+            changed = False
+            reloaded = header[2] != self.generation
+            if reloaded:
+                changed = bool(self.entries)
+                self._reset(header[2])
+                self.offset = f.tell()
+
+            f.seek(self.offset)
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, TypeError, AttributeError, ImportError):
+                    print(f"Stopping at unreadable history record at offset {self.offset}")
+                    break
+                self._apply(record)
+                self.offset = f.tell()
+                changed = True
+            if reloaded:
+                self.compacted_offset = self.offset
+            return changed
+
+    def _apply(self, record):
+        # Records written before timestamps and modes were added have no
+        # fifth or sixth field.
+        kind = record[0]
+        if kind == 'add':
+            entry_id, equation, result = record[1:4]
+            timestamp = record[4] if len(record) > 4 else 0.0
+            mode = record[5] if len(record) > 5 else ''
+            self.entries.add(compact_id(entry_id), equation, result, timestamp, mode)
+            if self.max_results is not None and len(self.entries) > self.max_results:
+                self.entries.remove_oldest()
+        elif kind == 'edit':
+            entry_id, equation, result = record[1:4]
+            timestamp = record[4] if len(record) > 4 else 0.0
+            mode = record[5] if len(record) > 5 else ''
+            self.entries.replace(compact_id(entry_id), equation, result, timestamp, mode)
+        elif kind == 'delete':
+            self.entries.remove(compact_id(record[1]))
+        elif kind == 'clear':
+            self.entries.clear()
+
+    def _reset(self, generation):
+        self.entries.clear()
+        self.generation = generation
+        self.offset = 0
+
+    def _compact(self):
+        """Rewrites the log as one add record per entry. The lock must be held."""
+        generation = uuid.uuid4().hex
+        directory = os.path.dirname(self.file_path) or '.'
+        fd, temp_path = tempfile.mkstemp(prefix='calculator_results', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((HISTORY_MAGIC, HISTORY_VERSION, generation), f)
+                for entry in self.entries.oldest_first():
+                    pickle.dump(('add', entry.entry_id, entry.equation, entry.result, entry.timestamp, entry.mode), f)
+                offset = f.tell()
+            os.replace(temp_path, self.file_path)
+        except OSError as e:
+            print(f"Could not compact results file: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.generation = generation
+        self.offset = offset
+        self.compacted_offset = offset
+
+    def watch(self, callback):
+        """Calls callback from a background thread whenever the results file changes."""
+        thread = threading.Thread(target=self._watch, args=(callback,), daemon=True)
+        thread.start()
+        return thread
+
+    def _watch(self, callback):
+        fd = self._open_inotify()
+        if fd is None:
+            print("inotify unavailable, polling the results file")
+            self._watch_polling(callback)
+        else:
+            print("Watching the results file with inotify")
+            self._watch_inotify(fd, callback)
+
+    def _open_inotify(self):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init()
+            if fd < 0:
+                return None
+            directory = os.path.dirname(self.file_path) or '.'
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _watch_inotify(self, fd, callback):
+        # The directory is watched rather than the file so that compaction,
+        # which replaces the file, keeps being noticed.
+        file_name = os.fsencode(os.path.basename(self.file_path))
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except OSError as e:
+                print(f"Error reading inotify events: {e}")
+                os.close(fd)
+                self._watch_polling(callback)
+                return
+            position = 0
+            touched = False
+            while position + INOTIFY_EVENT.size <= len(data):
+                _, _, _, name_length = INOTIFY_EVENT.unpack_from(data, position)
+                position += INOTIFY_EVENT.size
+                name = data[position:position + name_length].rstrip(b'\0')
+                position += name_length
+                if name == file_name:
+                    touched = True
+            if touched:
+                callback()
+
+    def _watch_polling(self, callback):
+        last_state = self._file_state()
+        while True:
+            time.sleep(POLL_INTERVAL)
+            state = self._file_state()
+            if state != last_state:
+                last_state = state
+                callback()
+
+    def _file_state(self):
+        try:
+            st = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+# Each unit is defined as a factor of another unit, or as a base unit of a
+# dimension when the reference is None. Temperatures also carry an offset.
+DIMENSIONS = ('length', 'mass', 'time', 'temperature', 'data')
+UNIT_DEFINITIONS = [
+    # symbol, factor, reference, offset
+    ('m', 1, None, 0),
+    ('km', 1000, 'm', 0),
+    ('cm', 0.01, 'm', 0),
+    ('mm', 0.001, 'm', 0),
+    ('µm', 0.001, 'mm', 0),
+    ('nm', 0.001, 'µm', 0),
+    ('inch', 0.0254, 'm', 0),
+    ('ft', 12, 'inch', 0),
+    ('yd', 3, 'ft', 0),
+    ('mi', 1760, 'yd', 0),
+    ('nmi', 1852, 'm', 0),
+    ('kg', 1, None, 0),
+    ('g', 0.001, 'kg', 0),
+    ('mg', 0.001, 'g', 0),
+    ('t', 1000, 'kg', 0),
+    ('lb', 0.45359237, 'kg', 0),
+    ('oz', 1 / 16, 'lb', 0),
+    ('s', 1, None, 0),
+    ('ms', 0.001, 's', 0),
+    ('min', 60, 's', 0),
+    ('h', 60, 'min', 0),
+    ('day', 24, 'h', 0),
+    ('week', 7, 'day', 0),
+    ('K', 1, None, 0),
+    ('°C', 1, 'K', 273.15),
+    ('°F', 5 / 9, 'K', 273.15 - 32 * 5 / 9),
+    ('degC', 1, '°C', 0),
+    ('degF', 1, '°F', 0),
+    ('B', 1, None, 0),
+    ('bit', 1 / 8, 'B', 0),
+    ('KB', 1000, 'B', 0),
+    ('kB', 1, 'KB', 0),
+    ('MB', 1000, 'KB', 0),
+    ('GB', 1000, 'MB', 0),
+    ('TB', 1000, 'GB', 0),
+    ('KiB', 1024, 'B', 0),
+    ('MiB', 1024, 'KiB', 0),
+    ('GiB', 1024, 'MiB', 0),
+    ('TiB', 1024, 'GiB', 0),
+]
+BASE_DIMENSIONS = {'m': 'length', 'kg': 'mass', 's': 'time', 'K': 'temperature', 'B': 'data'}
+NUMBER_PATTERN = r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+UNIT_TOKEN_RE = re.compile(r'(?<![\w.°µ])(?:(' + NUMBER_PATTERN + r')\s*)?(°?[A-Za-zµ]+)(\s*\^\s*-?\d+)?(?!\w|\s*\()')
+CONVERSION_RE = re.compile(r'^(.+?)\s+(?:in|to)\s+(\S.*)$')
+
+class UnitError(ValueError):
+    pass
+
+class Unit:
+    __slots__ = ('symbol', 'factor', 'dims', 'offset')
+
+    def __init__(self, symbol, factor, dims, offset=0):
+        self.symbol = symbol
+        self.factor = factor
+        self.dims = dims
+        self.offset = offset
+
+    def _combine(self, other, sign, symbol):
+        if self.offset or other.offset:
+            raise UnitError(f"offset units: {self.symbol} and {other.symbol}")
+        dims = tuple(a + sign * b for a, b in zip(self.dims, other.dims))
+        factor = self.factor * other.factor if sign > 0 else self.factor / other.factor
+        if not any(dims):
+            return factor
+        return Unit(symbol, factor, dims)
+
+    def __mul__(self, other):
+        if isinstance(other, Unit):
+            return self._combine(other, 1, f"{self.symbol}*{other.symbol}")
+        if isinstance(other, Quantity):
+            return other * self
+        return Quantity(other, self)
+
+    def __rmul__(self, other):
+        return Quantity(other, self)
+
+    def __truediv__(self, other):
+        if isinstance(other, Unit):
+            return self._combine(other, -1, f"{self.symbol}/{other.symbol}")
+        return Quantity(1, self) / other
+
+    def __rtruediv__(self, other):
+        return other / Quantity(1, self)
+
+    def __pow__(self, power):
+        if self.offset:
+            raise UnitError(f"offset units: {self.symbol}")
+        if not isinstance(power, (int, float)):
+            raise UnitError(f"unit exponent must be a number: {self.symbol}")
+        return Unit(f"{self.symbol}^{power}", self.factor ** power, tuple(d * power for d in self.dims))
+
+    def __float__(self):
+        raise UnitError(f"quantity has units: {self.symbol}")
+
+    def __str__(self):
+        return self.symbol
+
+class Quantity:
+    __slots__ = ('magnitude', 'unit')
+
+    def __init__(self, magnitude, unit):
+        self.magnitude = magnitude
+        self.unit = unit
+
+    def to(self, unit):
+        if self.unit.dims != unit.dims:
+            raise UnitError(f"incompatible units: {self.unit.symbol} and {unit.symbol}")
+        base = self.magnitude * self.unit.factor + self.unit.offset
+        return Quantity((base - unit.offset) / unit.factor, unit)
+
+    def _require_plain(self):
+        if self.unit.offset:
+            raise UnitError(f"offset units: {self.unit.symbol}")
+
+    def _add(self, other, sign):
+        if not isinstance(other, Quantity):
+            raise UnitError(f"incompatible units: {self.unit.symbol} and a plain number")
+        self._require_plain()
+        other._require_plain()
+        return Quantity(self.magnitude + sign * other.to(self.unit).magnitude, self.unit)
+
+    def __add__(self, other):
+        return self._add(other, 1)
+
+    def __radd__(self, other):
+        return self._add(other, 1)
+
+    def __sub__(self, other):
+        return self._add(other, -1)
+
+    def __rsub__(self, other):
+        return (-self)._add(other, 1)
+
+    def __neg__(self):
+        return Quantity(-self.magnitude, self.unit)
+
+    def __pos__(self):
+        return self
+
+    def __mul__(self, other):
+        self._require_plain()
+        if isinstance(other, Quantity):
+            other._require_plain()
+            unit = self.unit * other.unit
+            magnitude = self.magnitude * other.magnitude
+        elif isinstance(other, Unit):
+            unit = self.unit * other
+            magnitude = self.magnitude
+        else:
+            return Quantity(self.magnitude * other, self.unit)
+        if isinstance(unit, Unit):
+            return Quantity(magnitude, unit)
+        return magnitude * unit
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __truediv__(self, other):
+        self._require_plain()
+        if isinstance(other, Quantity):
+            other._require_plain()
+            unit = self.unit / other.unit
+            magnitude = self.magnitude / other.magnitude
+        elif isinstance(other, Unit):
+            unit = self.unit / other
+            magnitude = self.magnitude
+        else:
+            return Quantity(self.magnitude / other, self.unit)
+        if isinstance(unit, Unit):
+            return Quantity(magnitude, unit)
+        return magnitude * unit
+
+    def __rtruediv__(self, other):
+        return Quantity(other / self.magnitude, self.unit ** -1)
+
+    def __pow__(self, power):
+        if isinstance(power, Quantity):
+            raise UnitError(f"quantity has units: {power.unit.symbol}")
+        return Quantity(self.magnitude ** power, self.unit ** power)
+
+    def __float__(self):
+        raise UnitError(f"quantity has units: {self.unit.symbol}")
+
+    def __str__(self):
+        magnitude = self.magnitude
+        if isinstance(magnitude, float):
+            magnitude = format(magnitude, '.12g')
+        return f"{magnitude} {self.unit.symbol}"
+
+class UnitRegistry:
+    """Unit lookup table, resolved to canonical base units on first use.
+
+    Definitions reference each other (mi -> yd -> ft -> inch -> m), so the
+    chains are followed once when the table is built. After that every
+    conversion is a dictionary lookup and one multiply-add per unit.
+    """
+    def __init__(self, definitions):
+        self.definitions = {symbol: (factor, reference, offset) for symbol, factor, reference, offset in definitions}
+        self.units = None
+
+    def _build(self):
+        units = {}
+
+        def resolve(symbol):
+            if symbol in units:
+                return units[symbol]
+            factor, reference, offset = self.definitions[symbol]
+            if reference is None:
+                dims = tuple(int(BASE_DIMENSIONS[symbol] == name) for name in DIMENSIONS)
+                unit = Unit(symbol, factor, dims, offset)
+            else:
+                parent = resolve(reference)
+                unit = Unit(symbol, factor * parent.factor, parent.dims, offset * parent.factor + parent.offset)
+            units[symbol] = unit
+            return unit
+
+        for symbol in self.definitions:
+            resolve(symbol)
+        print(f"Unit table built with {len(units)} units")
+        self.units = units
+
+    def get(self, symbol):
+        if self.units is None:
+            self._build()
+        try:
+            return self.units[symbol]
+        except KeyError:
+            raise UnitError(f"unknown unit: {symbol}") from None
+
+    def __contains__(self, symbol):
+        return symbol in self.definitions
+
+    def rewrite(self, expression, strict=False, keep=()):
+        """Turns unit names into registry lookups, e.g. "5 km" into "(5*_unit('km'))".
+
+        Names in keep are left alone, e.g. a variable called s or m.
+        """
+        def replace(match):
+            number, word, power = match.groups()
+            if word not in self or word in keep:
+                if strict:
+                    raise UnitError(f"unknown unit: {word}")
+                return match.group(0)
+            unit = f"_unit('{word}'){power or ''}"
+            if number is None:
+                return unit
+            return f"({number}*{unit})"
+        return UNIT_TOKEN_RE.sub(replace, expression)
+
+UNITS = UnitRegistry(UNIT_DEFINITIONS)
+
+def split_conversion(equation):
+    """Splits "5 km in mi" into the expression and the target unit, if any."""
+    match = CONVERSION_RE.match(equation.strip())
+    if match:
+        return match.group(1), match.group(2)
+    return equation, None
+
+LAST_RE = re.compile(r'\blast\s+(\d+)\b')
+AGGREGATE_FUNCTIONS = {
+    'count': len,
+    'sum': sum,
+    'mean': statistics.fmean,
+    'min': min,
+    'max': max,
+    'variance': statistics.variance,
+    'stdev': statistics.stdev,
+}
+
+class HistoryRange:
+    """The whole history, or its newest `last` entries, as an aggregate argument."""
+    __slots__ = ('entries', 'last')
+
+    def __init__(self, entries, last=None):
+        self.entries = entries
+        self.last = last
+
+def aggregate_function(name, fallback):
+    def function(*args):
+        if len(args) == 1 and isinstance(args[0], HistoryRange):
+            value = args[0].entries.summary(args[0].last)[name]
+            if value is None:
+                raise ValueError("not enough results")
+            return value
+        return fallback(args)
+    return function
+
+def aggregate_names(entries):
+    """Names for sum(history), mean(last 20) and friends, backed by the running aggregates."""
+    names = {name: aggregate_function(name, fallback) for name, fallback in AGGREGATE_FUNCTIONS.items()}
+    if entries is not None:
+        names['history'] = HistoryRange(entries)
+        names['_last'] = lambda last: HistoryRange(entries, last)
+    return names
+
+def compile_expression(expression, strict_units=False):
+    source = UNITS.rewrite(LAST_RE.sub(r'_last(\1)', expression), strict=strict_units).replace('^', '**')
+    return compile(source, '<equation>', 'eval')
+
+def run_expression(code, entries=None):
+    allowed_names = {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
+    allowed_names.update(aggregate_names(entries))
+    allowed_names['_unit'] = UNITS.get
+    return eval(code, {"__builtins__": {}}, allowed_names)
+
+def eval_expression(expression, strict_units=False, entries=None):
+    return run_expression(compile_expression(expression, strict_units), entries)
+
+def evaluation_mode(code, target=None):
+    """The mode an expression is evaluated in, from the names its code looks up."""
+    names = set(code.co_names)
+    if target is not None or '_unit' in names:
+        return 'units'
+    if names & {'history', '_last'}:
+        return 'statistics'
+    if names:
+        return 'advanced'
+    return 'standard'
+
+def evaluate_equation(equation, entries=None):
+    """Evaluates an equation, converting the result when it ends in "in <unit>".
+
+    Returns the result and its evaluation mode.
+    """
+    expression, target = split_conversion(equation)
+    code = compile_expression(expression)
+    result = run_expression(code, entries)
+    if target is not None:
+        unit = eval_expression(target, strict_units=True)
+        if isinstance(unit, Quantity) and unit.magnitude == 1:
+            unit = unit.unit
+        if not isinstance(unit, Unit):
+            raise UnitError(f"unknown unit: {target.strip()}")
+        if not isinstance(result, Quantity):
+            raise UnitError(f"no units to convert: {expression.strip()}")
+        result = result.to(unit)
+    return result, evaluation_mode(code, target)
+
+MAX_DISPLAY_BITS = 100
+DECIMAL_CHUNK_BITS = 1024
+
+def result_int(result):
+    """Returns the integer behind a result (or its magnitude), or None."""
+    if isinstance(result, Quantity):
+        result = result.magnitude
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return None
+
+def is_large_result(result):
+    n = result_int(result)
+    return n is not None and n.bit_length() > MAX_DISPLAY_BITS
+
+def count_digits(n):
+    """Number of decimal digits of abs(n), without converting it to a string."""
+    n = abs(n)
+    if n == 0:
+        return 1
+    log = math.log10(n)
+    digits = int(log) + 1
+    fraction = log - int(log)
+    if fraction < 1e-9 and n < 10 ** (digits - 1):
+        digits -= 1
+    elif fraction > 1 - 1e-9 and n >= 10 ** digits:
+        digits += 1
+    return digits
+
+def format_result(result):
+    """Short text for the results list; huge integers are shown in scientific form."""
+    if isinstance(result, str):
+        return result
+    if not is_large_result(result):
+        return str(result)
+    if isinstance(result, Quantity):
+        return f"{format_result(result.magnitude)} {result.unit.symbol}"
+    digits = count_digits(result)
+    exponent = digits - 1
+    mantissa = min(10 ** (math.log10(abs(result)) - exponent), 9.9999999999)
+    sign = '-' if result < 0 else ''
+    return f"{sign}{mantissa:.10f}e+{exponent} ({digits} digits)"
+
+def int_to_decimal_string(n):
+    """Converts an int of any size to decimal text in subquadratic time.
+
+    str() on an int is quadratic and limited by sys.set_int_max_str_digits,
+    so the number is split in halves by bit position, each half converted
+    to a Decimal and recombined with a cached power of two. libmpdec
+    multiplies large operands in subquadratic time, and str() of the final
+    Decimal is linear.
+    """
+    context = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+    powers = {}
+
+    def power_of_two(w):
+        if w not in powers:
+            powers[w] = decimal.Decimal(2) ** w
+        return powers[w]
+
+    def convert(n, w):
+        if w <= DECIMAL_CHUNK_BITS:
+            return decimal.Decimal(n)
+        half = w >> 1
+        high = n >> half
+        low = n - (high << half)
+        return convert(low, half) + convert(high, w - half) * power_of_two(half)
+
+    with decimal.localcontext(context):
+        text = str(convert(abs(n), n.bit_length()))
+    return '-' + text if n < 0 else text
+
+DECIMAL_CHUNK_DIGITS = 300
+
+def decimal_string_to_int(text):
+    """Converts decimal text of any length to an int, the reverse of int_to_decimal_string.
+
+    The digits are split in halves and joined with a multiply by a cached
+    power of ten, so only short chunks ever go through int().
+    """
+    powers = {}
+
+    def power_of_ten(w):
+        if w not in powers:
+            powers[w] = 10 ** w
+        return powers[w]
+
+    def convert(digits):
+        if len(digits) <= DECIMAL_CHUNK_DIGITS:
+            return int(digits)
+        half = len(digits) >> 1
+        return convert(digits[:-half]) * power_of_ten(half) + convert(digits[-half:])
+
+    sign = text[:1]
+    if sign in '+-':
+        text = text[1:]
+    value = convert(text)
+    return -value if sign == '-' else value
+
+def result_to_text(result):
+    """All digits of a result."""
+    if isinstance(result, Quantity):
+        # str() of a quantity rounds the magnitude for display.
+        return f"{result_to_text(result.magnitude)} {result.unit.symbol}"
+    if not is_large_result(result):
+        return repr(result) if isinstance(result, float) else str(result)
+    return int_to_decimal_string(result)
+
+# Cached, since large conversions take a while and are often viewed and copied in turn.
+full_result_text = functools.lru_cache(maxsize=8, typed=True)(result_to_text)
+
+EXPORT_FIELDS = ('equation', 'result', 'timestamp', 'mode')
+HISTORY_FILE_WILDCARD = "CSV files (*.csv)|*.csv|JSON Lines files (*.jsonl)|*.jsonl"
+RECORDING_WILDCARD = "Input recordings (*.jsonl)|*.jsonl"
+EXPORT_CHUNK_SIZE = 10000
+# Results are exported with all their digits, far past the csv module's default 128 KiB field limit.
+# This is the largest limit a C long takes on every platform.
+CSV_FIELD_LIMIT = 2 ** 31 - 1
+INTEGER_RE = re.compile(r'^[+-]?\d+$')
+QUANTITY_RE = re.compile(r'^(-?' + NUMBER_PATTERN + r')\s+(°?[A-Za-zµ]+)$')
+
+def format_timestamp(timestamp):
+    if not timestamp:
+        return ''
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+def parse_timestamp(text):
+    if not text:
+        return 0.0
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+def parse_number(text):
+    if INTEGER_RE.match(text):
+        # int() on a string is limited to a few thousand digits.
+        return decimal_string_to_int(text)
+    return float(text)
+
+def parse_result(text):
+    """Turns exported result text back into a number or a quantity in a single unit where possible.
+
+    The text is only parsed, never evaluated, since it comes from a file.
+    Anything else, including compound units, is kept as text.
+    """
+    text = text.strip()
+    try:
+        return parse_number(text)
+    except ValueError:
+        pass
+    match = QUANTITY_RE.match(text)
+    if match and match.group(2) in UNITS:
+        return Quantity(parse_number(match.group(1)), UNITS.get(match.group(2)))
+    return text
+
+def export_rows(entries):
+    """Yields one export row per history entry, oldest first."""
+    for entry in entries.oldest_first():
+        yield entry.equation, result_to_text(entry.result), format_timestamp(entry.timestamp), entry.mode
+
+def export_history(entries, file_path, progress=None):
+    """Writes the history to CSV, or to JSON Lines for a .jsonl file, EXPORT_CHUNK_SIZE rows at a time."""
+    rows = export_rows(entries)
+    count = 0
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        json_lines = file_path.lower().endswith(('.jsonl', '.json'))
+        if not json_lines:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+        while True:
+            chunk = list(itertools.islice(rows, EXPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            if json_lines:
+                f.write(''.join(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n' for row in chunk))
+            else:
+                writer.writerows(chunk)
+            count += len(chunk)
+            if progress is not None:
+                progress(count)
+    return count
+
+def read_history_rows(file_path):
+    """Yields (equation, result, timestamp, mode) for each row of an exported CSV or JSON Lines file."""
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        if file_path.lower().endswith(('.jsonl', '.json')):
+            records = (json.loads(line) for line in f if line.strip())
+            previous_limit = None
+        else:
+            records = csv.DictReader(f)
+            previous_limit = csv.field_size_limit(CSV_FIELD_LIMIT)
+        try:
+            for record in records:
+                mode = record.get('mode') or ''
+                yield (record['equation'], parse_result(str(record['result'])),
+                       parse_timestamp(record.get('timestamp') or ''), mode if mode in MODE_NUMBERS else '')
+        finally:
+            if previous_limit is not None:
+                csv.field_size_limit(previous_limit)
+
+TABULATE_RE = re.compile(r'^\s*tabulate\s+(.+?)\s+for\s+([A-Za-z_]\w*)\s+from\s+(.+?)\s+to\s+(.+?)\s*$')
+TABLE_INITIAL_INTERVALS = 16
+TABLE_MAX_ROWS = 400
+TABLE_TOLERANCE = 0.002
+TABLE_MIN_WIDTH = 1e-4
+TABLE_BREAK_PRIORITY = 1.0
+
+def compile_function(expression, variable):
+    """Compiles an expression of one variable into a function returning a float, or None where it is undefined."""
+    source = UNITS.rewrite(expression, keep=(variable,)).replace('^', '**')
+    code = compile(source, '<tabulate>', 'eval')
+    names = {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
+    names['_unit'] = UNITS.get
+    # Misspelt functions and the wrong variable are reported here, before any sampling starts.
+    for name in code.co_names:
+        if name not in names and name != variable:
+            raise NameError(f"name '{name}' is not defined")
+
+    def function(x):
+        names[variable] = x
+        try:
+            y = eval(code, {"__builtins__": {}}, names)
+        except (ArithmeticError, ValueError, TypeError):
+            return None
+        if isinstance(y, bool) or not isinstance(y, (int, float)):
+            return None
+        try:
+            y = float(y)
+        except OverflowError:
+            return None
+        return y if math.isfinite(y) else None
+
+    return function
+
+def adaptive_samples(function, start, end, max_rows=TABLE_MAX_ROWS, tolerance=TABLE_TOLERANCE):
+    """Yields (x, f(x)) pairs, sampling densely where f bends, jumps, crosses zero or is undefined.
+
+    A coarse uniform grid comes first. After that the interval with the
+    highest priority is split at its midpoint, one new row per split.
+    Intervals whose ends differ in sign or in being defined get a fixed
+    high priority, so zeros and breaks are narrowed down to TABLE_MIN_WIDTH
+    of the range. Otherwise the priority is how far the midpoint is from
+    the straight line between the ends, relative to the range of values
+    seen so far, and each half inherits a quarter of it. Sampling stops
+    when every interval is within tolerance or max_rows rows are out.
+    """
+    min_width = (end - start) * TABLE_MIN_WIDTH
+    xs = [start + (end - start) * i / TABLE_INITIAL_INTERVALS for i in range(TABLE_INITIAL_INTERVALS + 1)]
+    ys = []
+    for x in xs:
+        y = function(x)
+        ys.append(y)
+        yield x, y
+    defined = [y for y in ys if y is not None]
+    low, high = (min(defined), max(defined)) if defined else (0.0, 0.0)
+
+    # Heap entries: (-priority, order, a, f(a), b, f(b)); order keeps ties left to right.
+    order = itertools.count()
+    heap = [(-TABLE_BREAK_PRIORITY, next(order), a, fa, b, fb) for a, fa, b, fb in zip(xs, ys, xs[1:], ys[1:])]
+    rows = len(xs)
+    while heap and rows < max_rows:
+        priority, _, a, fa, b, fb = heapq.heappop(heap)
+        if -priority < tolerance:
+            break
+        m = (a + b) / 2
+        fm = function(m)
+        yield m, fm
+        rows += 1
+        if fm is not None:
+            low, high = min(low, fm), max(high, fm)
+        if None in (fa, fm, fb):
+            error = 0.0
+        else:
+            error = abs(fm - (fa + fb) / 2) / ((high - low) or 1.0)
+        for left, f_left, right, f_right in ((a, fa, m, fm), (m, fm, b, fb)):
+            if right - left < min_width:
+                continue
+            if (f_left is None) != (f_right is None) or (f_left is not None and f_left * f_right < 0):
+                child = TABLE_BREAK_PRIORITY
+            else:
+                child = error / 4
+            heapq.heappush(heap, (-child, next(order), left, f_left, right, f_right))
 
 class ResultViewerDialog(wx.Dialog):
     def __init__(self, parent, result):
         super().__init__(parent, title="View Result", size=(300, 150))
         panel = wx.Panel(self)
         
-        self.result_text = wx.TextCtrl(panel, value=result, style=wx.TE_READONLY | wx.TE_MULTILINE)
+        if is_large_result(result):
+            value = f"{format_result(result)}\n\nCalculating all digits..."
+            parent.expand_result(result, self.show_full_text)
+        else:
+            value = format_result(result)
+        self.result_text = wx.TextCtrl(panel, value=value, style=wx.TE_READONLY | wx.TE_MULTILINE)
         self.result_text.SetFocus()
         
         sizer = wx.BoxSizer(wx.VERTICAL)
@@ -31,6 +1382,10 @@ class ResultViewerDialog(wx.Dialog):
         else:
             event.Skip()
 
+    def show_full_text(self, text):
+        if self:
+            self.result_text.SetValue(text)
+
 class HelpDialog(wx.Dialog):
     def __init__(self, parent):
         super().__init__(parent, title="Help", size=(450, 400))
@@ -55,10 +1410,28 @@ Context menu shortcuts:
 - Ctrl+C: Copy only the result.
 - Delete: Delete selected result.
 - Ctrl+L: Clear all results.
+- Ctrl+T: Show statistics of the selected results, or of all results.
+- Ctrl+S: Export the history to a CSV or JSON Lines file.
+- Ctrl+O: Import a history file exported by the calculator. Imported results are added as the newest results, keeping their original times.
+- Ctrl+Shift+R: Start or stop recording your input, for reproducing problems.
+- Ctrl+Shift+P: Replay a recording on a copy of the history and report how long each step took.
+- Shift+Arrows or Ctrl+Space: Select several results.
+
+Statistics:
+- Type sum(history), mean(history), min, max, count, variance or stdev over the results list.
+- Use "last N" for the newest results only, e.g. mean(last 20).
+
+Tables:
+- Type tabulate, an expression, a variable and a range, e.g. tabulate sin(x) for x from 0 to 2*pi.
+- The table fills in as values are calculated, with more rows where the function changes quickly or crosses zero.
 
 Advanced Mode:
 - Press the "Advanced" button or Ctrl+Shift+V to show/hide a panel with advanced mathematical functions and constants.
 - You can type functions (e.g., sin(30)) or use the buttons.
+
+Units:
+- Write a unit after a number and end with "in" or "to" to convert, e.g. 5 km + 300 m in mi, 212 °F in °C, 1 MB to MiB.
+- Supported units include m, km, mi, ft, kg, lb, s, h, K, °C, °F (or degC, degF), B, MB, MiB.
             """,
             "العربية": """
 مرحباً بك في الآلة الحاسبة الميسرة!
@@ -79,10 +1452,28 @@ Advanced Mode:
 - Ctrl+C: نسخ النتيجة فقط.
 - Delete: حذف النتيجة المحددة.
 - Ctrl+L: مسح كل النتائج.
+- Ctrl+T: عرض إحصائيات النتائج المحددة، أو كل النتائج.
+- Ctrl+S: تصدير السجل إلى ملف CSV أو JSON Lines.
+- Ctrl+O: استيراد ملف سجل تم تصديره من الآلة الحاسبة. تضاف النتائج المستوردة كأحدث النتائج مع الاحتفاظ بأوقاتها الأصلية.
+- Ctrl+Shift+R: بدء أو إيقاف تسجيل الإدخال، لإعادة إنتاج المشكلات.
+- Ctrl+Shift+P: إعادة تشغيل تسجيل على نسخة من السجل وعرض الوقت الذي استغرقته كل خطوة.
+- Shift+الأسهم أو Ctrl+Space: تحديد عدة نتائج.
+
+الإحصائيات:
+- اكتب sum(history) أو mean(history) أو min أو max أو count أو variance أو stdev على قائمة النتائج.
+- استخدم "last N" لأحدث النتائج فقط، مثال: mean(last 20).
+
+الجداول:
+- اكتب tabulate ثم التعبير والمتغير والمدى، مثال: tabulate sin(x) for x from 0 to 2*pi.
+- يمتلئ الجدول أثناء حساب القيم، مع صفوف أكثر حيث تتغير الدالة بسرعة أو تمر بالصفر.
 
 الوضع المتقدم:
 - اضغط على زر "Advanced" أو Ctrl+Shift+V لإظهار/إخفاء لوحة تحتوي على دوال وثوابت رياضية متقدمة.
 - يمكنك كتابة الدوال يدويًا (مثال: sin(30)) أو استخدام الأزرار.
+
+الوحدات:
+- اكتب الوحدة بعد الرقم وأنهِ المعادلة بـ "in" أو "to" للتحويل، مثال: 5 km + 300 m in mi أو 212 °F in °C أو 1 MB to MiB.
+- من الوحدات المدعومة: m, km, mi, ft, kg, lb, s, h, K, °C, °F (أو degC, degF), B, MB, MiB.
             """
         }
 
@@ -119,8 +1510,291 @@ Advanced Mode:
         else:
             event.Skip()
 
-class AccessibleCalculator(wx.Frame):
+class FunctionTableList(wx.ListCtrl):
+    """Virtual list showing the rows of a FunctionTableDialog."""
+    def __init__(self, parent, table, variable):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+        self.table = table
+        self.InsertColumn(0, variable, width=140)
+        self.InsertColumn(1, "Value", width=160)
+        self.InsertColumn(2, "Note", width=110)
+
+    def OnGetItemText(self, item, column):
+        return self.table.cell_text(item, column)
+
+class FunctionTableDialog(wx.Dialog):
+    def __init__(self, parent, expression, variable, function, start, end):
+        super().__init__(parent, title=f"Table of {expression}", size=(460, 420))
+        panel = wx.Panel(self)
+        
+        self.xs = []
+        self.ys = []
+        self.cancelled = False
+        self.status_text = wx.StaticText(panel, label="Calculating...")
+        self.table_list = FunctionTableList(panel, self, variable)
+        self.table_list.SetFocus()
+        
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.status_text, 0, wx.ALL, 10)
+        sizer.Add(self.table_list, 1, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        
+        panel.SetSizer(sizer)
+        
+        self.Bind(wx.EVT_CHAR_HOOK, self.on_key_down)
+        
+        threading.Thread(target=self.compute, args=(function, start, end), daemon=True).start()
+        self.ShowModal()
+        self.cancelled = True
+
+    def compute(self, function, start, end):
+        """Runs in a separate thread and hands rows to the dialog in small batches."""
+        batch = []
+        last_sent = time.perf_counter()
+        try:
+            for row in adaptive_samples(function, start, end):
+                if self.cancelled:
+                    return
+                batch.append(row)
+                if time.perf_counter() - last_sent > 0.05:
+                    wx.CallAfter(self.add_rows, batch)
+                    batch = []
+                    last_sent = time.perf_counter()
+        except Exception as e:
+            print(f"Error in table: {str(e)}")
+            wx.CallAfter(self.add_rows, batch)
+            wx.CallAfter(self.fail, str(e))
+            return
+        wx.CallAfter(self.add_rows, batch)
+        wx.CallAfter(self.finish)
+
+    def add_rows(self, rows):
+        # Rows arrive out of order, so keep the focused row on the same x.
+        focused = self.table_list.GetFocusedItem()
+        focused_x = self.xs[focused] if focused != -1 else None
+        for x, y in rows:
+            index = bisect.bisect(self.xs, x)
+            self.xs.insert(index, x)
+            self.ys.insert(index, y)
+        self.table_list.SetItemCount(len(self.xs))
+        if focused_x is not None:
+            index = bisect.bisect_left(self.xs, focused_x)
+            self.table_list.Focus(index)
+            self.table_list.Select(index)
+        self.table_list.Refresh()
+        self.status_text.SetLabel(f"Calculating... {len(self.xs)} rows")
+
+    def fail(self, error_message):
+        message = self.GetParent().get_user_friendly_error(error_message)
+        self.status_text.SetLabel(f"Stopped after {len(self.xs)} rows. {message}")
+        self.GetParent().show_message(message, "Error", wx.OK | wx.ICON_ERROR)
+
+    def finish(self):
+        self.status_text.SetLabel(f"{len(self.xs)} rows")
+        if self.table_list.GetFocusedItem() == -1 and self.xs:
+            self.table_list.Focus(0)
+            self.table_list.Select(0)
+
+    def cell_text(self, index, column):
+        x, y = self.xs[index], self.ys[index]
+        if column == 0:
+            return format(x, '.10g')
+        if column == 1:
+            return "undefined" if y is None else format(y, '.10g')
+        if y is None:
+            return "undefined"
+        if y == 0:
+            return "zero"
+        previous = self.ys[index - 1] if index > 0 else None
+        if previous is not None and previous * y < 0:
+            return "sign change"
+        return ""
+
+    def on_key_down(self, event):
+        if event.GetKeyCode() == wx.WXK_ESCAPE:
+            self.Close()
+        else:
+            event.Skip()
+
+class ReplayEvent:
+    """Stands in for the wx events that the recorded handlers receive."""
+    def __init__(self, key_code=0, unicode_key=0, modifiers=0, label=None):
+        self.key_code = key_code
+        self.unicode_key = unicode_key
+        self.modifiers = modifiers
+        self.label = label
+        self.skipped = False
+
+    def GetKeyCode(self):
+        return self.key_code
+
+    def GetUnicodeKey(self):
+        return self.unicode_key
+
+    def GetModifiers(self):
+        return self.modifiers
+
+    def GetEventObject(self):
+        return self
+
+    def GetLabel(self):
+        return self.label
+
+    def Skip(self, skip=True):
+        self.skipped = skip
+
+class InputRecorder:
+    """Collects the input events handled by the calculator, for InputReplayer."""
     def __init__(self):
+        self.steps = []
+        self.start = time.perf_counter()
+
+    def record(self, kind, **details):
+        step = {'t': round(time.perf_counter() - self.start, 4), 'kind': kind}
+        step.update(details)
+        self.steps.append(step)
+        return step
+
+    def note_text(self, step, text_ctrl):
+        """Adds what a text box shows after a key, so a replay ends up with the same text."""
+        step['text'] = text_ctrl.GetValue()
+        step['position'] = text_ctrl.GetInsertionPoint()
+
+    def save(self, file_path):
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for step in self.steps:
+                f.write(json.dumps(step) + '\n')
+
+def load_recording(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class InputReplayer:
+    """Feeds recorded steps back into a calculator as fast as it handles them.
+
+    Each step goes through the same handler it was recorded from. The
+    replayer then processes pending events and repaints the window, and
+    the time until then is the step's latency. Message boxes and dialogs
+    are not shown while replaying, so nothing waits for a person.
+    """
+    NAVIGATION_KEYS = (wx.WXK_UP, wx.WXK_DOWN, wx.WXK_HOME, wx.WXK_END)
+
+    def __init__(self, frame, steps):
+        self.frame = frame
+        self.steps = steps
+
+    def run(self):
+        """Returns one (step number, kind, detail, latency in ms) row per step."""
+        report = []
+        self.frame.replaying = True
+        try:
+            for number, step in enumerate(self.steps, 1):
+                start = time.perf_counter()
+                detail = self.dispatch(step)
+                wx.GetApp().Yield(True)
+                self.frame.Update()
+                report.append((number, step['kind'], detail, (time.perf_counter() - start) * 1000))
+        finally:
+            self.frame.replaying = False
+        return report
+
+    def dispatch(self, step):
+        frame = self.frame
+        kind = step['kind']
+        if kind == 'char':
+            event = ReplayEvent(step['key'], step['unicode'], step['modifiers'])
+            frame.on_char(event)
+            if event.skipped:
+                self.type_key(event)
+            # Keys the replayer does not imitate (selections, paste) still
+            # leave the text box as it was when recorded. Return steps from
+            # older recordings noted the box after it was cleared, so their
+            # text is ignored.
+            if ('text' in step and step['key'] not in (wx.WXK_RETURN, wx.WXK_NUMPAD_ENTER)
+                    and frame.equation.GetValue() != step['text']):
+                frame.equation.SetValue(step['text'])
+                frame.equation.SetInsertionPoint(step['position'])
+            return chr(step['unicode']) if 32 <= step['unicode'] != wx.WXK_DELETE else str(step['key'])
+        if kind == 'button':
+            frame.on_button_click(ReplayEvent(label=step['label']))
+            return step['label']
+        if kind == 'enter':
+            if 'text' in step and frame.equation.GetValue() != step['text']:
+                frame.equation.SetValue(step['text'])
+                frame.equation.SetInsertionPointEnd()
+            equation = frame.equation.GetValue()
+            frame.on_enter(ReplayEvent(wx.WXK_RETURN))
+            return equation
+        if kind == 'list_key':
+            self.select(step['selection'])
+            event = ReplayEvent(step['key'], 0, step['modifiers'])
+            frame.on_list_key_down(event)
+            if event.skipped and step['key'] in self.NAVIGATION_KEYS:
+                self.move_selection(step['key'])
+            return str(step['key'])
+        raise ValueError(f"unknown recorded step: {kind}")
+
+    def type_key(self, event):
+        """What the text box itself would have done with a skipped key."""
+        equation = self.frame.equation
+        key_code = event.key_code
+        position = equation.GetInsertionPoint()
+        if key_code == wx.WXK_BACK:
+            if position > 0:
+                equation.Remove(position - 1, position)
+        elif key_code == wx.WXK_DELETE:
+            if position < equation.GetLastPosition():
+                equation.Remove(position, position + 1)
+        elif key_code == wx.WXK_LEFT:
+            equation.SetInsertionPoint(max(position - 1, 0))
+        elif key_code == wx.WXK_RIGHT:
+            equation.SetInsertionPoint(min(position + 1, equation.GetLastPosition()))
+        elif key_code == wx.WXK_HOME:
+            equation.SetInsertionPoint(0)
+        elif key_code == wx.WXK_END:
+            equation.SetInsertionPointEnd()
+        elif 32 <= event.unicode_key != wx.WXK_DELETE and not event.modifiers & wx.MOD_CONTROL:
+            equation.WriteText(chr(event.unicode_key))
+
+    def select(self, selection):
+        result_list = self.frame.result_list
+        result_list.SetSelection(wx.NOT_FOUND)
+        for index in selection:
+            if index < result_list.GetCount():
+                result_list.SetSelection(index)
+
+    def move_selection(self, key_code):
+        count = self.frame.result_list.GetCount()
+        if not count:
+            return
+        index = self.frame.selected_index()
+        if key_code == wx.WXK_HOME:
+            index = 0
+        elif key_code == wx.WXK_END:
+            index = count - 1
+        elif key_code == wx.WXK_UP:
+            index = max(index - 1, 0)
+        else:
+            index = min(index + 1, count - 1)
+        self.select([index])
+
+def latency_summary(report):
+    latencies = sorted(row[3] for row in report)
+    if not latencies:
+        return "No steps were replayed."
+    slowest = max(report, key=lambda row: row[3])
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return (f"Replayed {len(latencies)} steps. Mean {statistics.fmean(latencies):.1f} ms, "
+            f"median {statistics.median(latencies):.1f} ms, 95th percentile {p95:.1f} ms, "
+            f"slowest {slowest[3]:.1f} ms (step {slowest[0]}, {slowest[1]} {slowest[2]!r}).")
+
+def write_latency_report(report, file_path):
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('step', 'kind', 'detail', 'latency_ms'))
+        writer.writerows((number, kind, detail, f"{latency:.3f}") for number, kind, detail, latency in report)
+
+class AccessibleCalculator(wx.Frame):
+    def __init__(self, history_path=None):
         super().__init__(parent=None, title='Accessible Calculator')
         print("Initializing AccessibleCalculator")
         self.main_panel = wx.Panel(self)
@@ -137,8 +1811,9 @@ class AccessibleCalculator(wx.Frame):
         
         self.result_panel = wx.Panel(self.main_panel)
         self.result_label = wx.StaticText(self.result_panel, label="Results List:")
-        self.result_list = wx.ListBox(self.result_panel, style=wx.LB_SINGLE)
+        self.result_list = wx.ListBox(self.result_panel, style=wx.LB_EXTENDED)
         self.result_list.Bind(wx.EVT_CONTEXT_MENU, self.on_context_menu)
+        self.result_list.Bind(wx.EVT_LISTBOX, self.on_selection_changed)
         self.result_list.Bind(wx.EVT_KEY_DOWN, self.on_list_key_down)
         
         result_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -190,11 +1865,15 @@ class AccessibleCalculator(wx.Frame):
         
         self.statusbar = self.CreateStatusBar()
         
-        self.results = []
+        self.history = HistoryStore(history_path or os.path.join(tempfile.gettempdir(), HISTORY_FILE_NAME))
+        self.shown_versions = []
         self.load_results()
         self.update_result_list()
+        self.history.watch(lambda: wx.CallAfter(self.on_history_changed))
         
-        self.editing_index = None
+        self.editing_id = None
+        self.recorder = None
+        self.replaying = False
         
         self.setup_accelerators()
         
@@ -214,17 +1893,29 @@ class AccessibleCalculator(wx.Frame):
         help_id = wx.NewId()
         close_id = wx.NewId()
         advanced_id = wx.NewId()
+        export_id = wx.NewId()
+        import_id = wx.NewId()
+        record_id = wx.NewId()
+        replay_id = wx.NewId()
 
         self.Bind(wx.EVT_MENU, self.focus_equation, id=focus_id)
         self.Bind(wx.EVT_MENU, lambda event: self.show_help(), id=help_id)
         self.Bind(wx.EVT_MENU, lambda event: self.Close(), id=close_id)
         self.Bind(wx.EVT_MENU, self.toggle_advanced_mode, id=advanced_id)
+        self.Bind(wx.EVT_MENU, self.on_export, id=export_id)
+        self.Bind(wx.EVT_MENU, self.on_import, id=import_id)
+        self.Bind(wx.EVT_MENU, self.toggle_recording, id=record_id)
+        self.Bind(wx.EVT_MENU, self.on_replay, id=replay_id)
 
         accel_tbl = wx.AcceleratorTable([
             (wx.ACCEL_CTRL, ord('D'), focus_id),
             (wx.ACCEL_NORMAL, wx.WXK_F1, help_id),
             (wx.ACCEL_ALT, wx.WXK_F4, close_id),
-            (wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('V'), advanced_id)
+            (wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('V'), advanced_id),
+            (wx.ACCEL_CTRL, ord('S'), export_id),
+            (wx.ACCEL_CTRL, ord('O'), import_id),
+            (wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('R'), record_id),
+            (wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('P'), replay_id)
         ])
         self.SetAcceleratorTable(accel_tbl)
 
@@ -276,11 +1967,20 @@ class AccessibleCalculator(wx.Frame):
         self.Fit()
 
     def on_char(self, event):
+        if self.recorder is not None:
+            step = self.recorder.record('char', key=event.GetKeyCode(), unicode=event.GetUnicodeKey(), modifiers=event.GetModifiers())
+            # The text box only handles the key after this handler returns.
+            # Return submits and clears the box first, so the enter step
+            # records the equation instead.
+            if event.GetKeyCode() not in (wx.WXK_RETURN, wx.WXK_NUMPAD_ENTER):
+                wx.CallAfter(self.recorder.note_text, step, self.equation)
         event.Skip()
         
     def on_list_key_down(self, event):
         key_code = event.GetKeyCode()
         modifiers = event.GetModifiers()
+        if self.recorder is not None:
+            self.recorder.record('list_key', key=key_code, modifiers=modifiers, selection=list(self.result_list.GetSelections()))
         if key_code == wx.WXK_DELETE:
             self.on_delete_item(event)
         elif key_code == ord('E') and modifiers == wx.MOD_CONTROL:
@@ -293,16 +1993,22 @@ class AccessibleCalculator(wx.Frame):
             self.on_copy_result(event)
         elif key_code == ord('L') and modifiers == wx.MOD_CONTROL:
             self.on_clear_all(event)
+        elif key_code == ord('T') and modifiers == wx.MOD_CONTROL:
+            self.on_statistics(event)
         else:
             event.Skip()
 
     def on_enter(self, event):
         print("Enter key pressed")
+        if self.recorder is not None:
+            self.recorder.record('enter', text=self.equation.GetValue())
         self.calculate_result()
 
     def on_button_click(self, event):
         label = event.GetEventObject().GetLabel()
         print(f"Button clicked: {label}")
+        if self.recorder is not None:
+            self.recorder.record('button', label=label)
         if label == '=':
             self.calculate_result()
         elif label == 'Clear':
@@ -321,31 +2027,33 @@ class AccessibleCalculator(wx.Frame):
         print("Calculating result")
         equation = equation_str if equation_str is not None else self.equation.GetValue()
         
-        if not re.match(r'^[a-zA-Z0-9\s\+\-\*/\(\)\.\^]*$', equation):
+        if not re.match(r'^[a-zA-Z0-9\s\+\-\*/\(\)\.\^°µ]*$', equation):
             print("Invalid characters in equation")
-            wx.MessageBox("Invalid characters in equation. Please use only numbers, operators, and valid functions.", "Error", wx.OK | wx.ICON_ERROR)
+            self.show_message("Invalid characters in equation. Please use only numbers, operators, and valid functions.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        
+        tabulate_match = TABULATE_RE.match(equation)
+        if tabulate_match:
+            self.tabulate(*tabulate_match.groups())
             return
         
         has_operator = any(op in equation for op in ['+', '-', '*', '/', '^'])
-        has_function = any(func in equation for func in ['sin', 'cos', 'tan', 'sqrt', 'log', 'factorial', 'degrees', 'radians', 'exp'])
-        if not has_operator and not has_function and 'pi' not in equation and 'e' not in equation:
+        has_function = any(func in equation for func in ['sin', 'cos', 'tan', 'sqrt', 'log', 'factorial', 'degrees', 'radians', 'exp'] + list(AGGREGATE_FUNCTIONS))
+        has_conversion = split_conversion(equation)[1] is not None
+        if not has_operator and not has_function and not has_conversion and 'pi' not in equation and 'e' not in equation:
             print("No operation in equation")
-            wx.MessageBox("Please enter a complete equation with at least one operation or function.", "Error", wx.OK | wx.ICON_ERROR)
+            self.show_message("Please enter a complete equation with at least one operation or function.", "Error", wx.OK | wx.ICON_ERROR)
             return
         
         try:
-            equation_to_eval = equation.replace('^', '**')
+            result, mode = evaluate_equation(equation, self.history.entries)
             
-            allowed_names = {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
-
-            result = eval(equation_to_eval, {"__builtins__": {}}, allowed_names)
-            
-            print(f"Equation: {equation}, Result: {result}")
-            if self.editing_index is not None:
-                self.results[self.editing_index] = (equation, str(result))
-                self.editing_index = None
+            print(f"Equation: {equation}, Result: {format_result(result)}, Mode: {mode}")
+            if self.editing_id is not None:
+                self.history.replace(self.editing_id, equation, result, mode)
+                self.editing_id = None
             else:
-                self.add_result(equation, result)
+                self.add_result(equation, result, mode)
             
             if equation_str is None:
                 self.equation.Clear()
@@ -353,14 +2061,32 @@ class AccessibleCalculator(wx.Frame):
         except Exception as e:
             print(f"Error in calculation: {str(e)}")
             error_message = self.get_user_friendly_error(str(e))
-            wx.MessageBox(error_message, "Error", wx.OK | wx.ICON_ERROR)
+            self.show_message(error_message, "Error", wx.OK | wx.ICON_ERROR)
         finally:
             self.update_result_list()
-            print(f"Results list after calculation: {self.results}")
+            print(f"Results list after calculation: {len(self.results)} items")
             if self.results:
                 self.result_list.SetSelection(0)
                 self.result_list.SetFocus()
 
+    def tabulate(self, expression, variable, start_text, end_text):
+        print(f"Tabulating {expression} for {variable} from {start_text} to {end_text}")
+        try:
+            function = compile_function(expression, variable)
+            start = float(eval_expression(start_text))
+            end = float(eval_expression(end_text))
+        except Exception as e:
+            print(f"Error in table: {str(e)}")
+            self.show_message(self.get_user_friendly_error(str(e)), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if not start < end:
+            self.show_message("The start of the range must be smaller than its end.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if self.replaying:
+            print("Replay: would show the table")
+            return
+        FunctionTableDialog(self, expression, variable, function, start, end)
+
     def get_user_friendly_error(self, error_message):
         if "invalid syntax" in error_message:
             return "The equation contains invalid syntax. Please check your equation and try again."
@@ -370,22 +2096,52 @@ class AccessibleCalculator(wx.Frame):
             return "Invalid number format. Please use proper number format."
         elif "math domain error" in error_message:
             return "Mathematical error. The operation you're trying to perform is not valid."
+        elif "is not defined" in error_message:
+            name = error_message.split("'")[1] if error_message.count("'") >= 2 else error_message
+            return f"Unknown function or name \"{name}\". Please check the spelling."
+        elif error_message.startswith("incompatible units:"):
+            return f"Cannot combine or convert {error_message.split(': ', 1)[1]}. The units measure different things."
+        elif error_message.startswith("unknown unit:"):
+            return f"Unknown unit \"{error_message.split(': ', 1)[1]}\". Please check the unit name."
+        elif error_message.startswith("offset units:"):
+            return "Temperatures in °C or °F can only be converted, not added or multiplied. Convert them to K first."
+        elif error_message.startswith("quantity has units:"):
+            return f"This operation needs a plain number, but the value is in {error_message.split(': ', 1)[1]}."
+        elif error_message.startswith("no units to convert:"):
+            return "Only values with units can be converted. Add a unit, for example 5 km in mi."
+        elif "empty history" in error_message:
+            return "There are no numeric results to calculate statistics from."
+        elif "not enough results" in error_message:
+            return "At least two numeric results are needed for the variance or standard deviation."
         else:
             return "An error occurred while calculating. Please check your equation and try again."
 
-    def add_result(self, equation, result):
-        print(f"Adding result: {equation} = {result}")
-        self.results.insert(0, (equation, str(result)))
-        if len(self.results) > 10:
-            self.results.pop()
-        self.save_results()
+    def add_result(self, equation, result, mode=''):
+        print(f"Adding result: {equation} = {format_result(result)}")
+        self.history.add(equation, result, mode)
 
     def update_result_list(self):
-        print("Updating result list")
-        self.result_list.Clear()
-        for _, result in self.results:
-            self.result_list.Append(result)
-        print(f"Result list items: {[self.result_list.GetString(i) for i in range(self.result_list.GetCount())]}")
+        """Brings the list in line with the history, and returns True if it had to be rebuilt.
+
+        New results go in at the front and the oldest fall off the back, so
+        usually only those rows are touched instead of the whole list.
+        """
+        versions = list(self.results.versions())
+        shown = self.shown_versions
+        added = versions.index(shown[0]) if shown and shown[0] in versions else None
+        kept = len(versions) - added if added is not None else 0
+        rebuilt = not (added is not None and kept <= len(shown) and versions[added:] == shown[:kept])
+        if rebuilt:
+            print(f"Rebuilding result list with {len(versions)} items")
+            self.result_list.Set([format_result(result) for _, result in self.results])
+        else:
+            print(f"Updating result list: {added} added, {len(shown) - kept} removed")
+            for index in range(len(shown) - 1, kept - 1, -1):
+                self.result_list.Delete(index)
+            if added:
+                self.result_list.InsertItems([format_result(self.results[index][1]) for index in range(added)], 0)
+        self.shown_versions = versions
+        return rebuilt
 
     def clear_equation(self):
         print("Clearing equation")
@@ -400,6 +2156,9 @@ class AccessibleCalculator(wx.Frame):
             self.popupID4 = wx.NewId()
             self.popupID5 = wx.NewId()
             self.popupID6 = wx.NewId()
+            self.popupID7 = wx.NewId()
+            self.popupID8 = wx.NewId()
+            self.popupID9 = wx.NewId()
             
             self.Bind(wx.EVT_MENU, self.on_edit, id=self.popupID1)
             self.Bind(wx.EVT_MENU, self.on_view_result, id=self.popupID2)
@@ -407,6 +2166,9 @@ class AccessibleCalculator(wx.Frame):
             self.Bind(wx.EVT_MENU, self.on_copy_result, id=self.popupID4)
             self.Bind(wx.EVT_MENU, self.on_delete_item, id=self.popupID5)
             self.Bind(wx.EVT_MENU, self.on_clear_all, id=self.popupID6)
+            self.Bind(wx.EVT_MENU, self.on_statistics, id=self.popupID7)
+            self.Bind(wx.EVT_MENU, self.on_export, id=self.popupID8)
+            self.Bind(wx.EVT_MENU, self.on_import, id=self.popupID9)
 
         menu = wx.Menu()
         menu.Append(self.popupID1, "Edit\tCtrl+E")
@@ -415,48 +2177,157 @@ class AccessibleCalculator(wx.Frame):
         menu.Append(self.popupID4, "Copy Result\tCtrl+C")
         menu.Append(self.popupID5, "Delete Item\tDel")
         menu.Append(self.popupID6, "Clear All\tCtrl+L")
+        menu.Append(self.popupID7, "Statistics\tCtrl+T")
+        menu.Append(self.popupID8, "Export History...\tCtrl+S")
+        menu.Append(self.popupID9, "Import History...\tCtrl+O")
 
         self.PopupMenu(menu)
         menu.Destroy()
 
     def on_edit(self, event):
-        index = self.result_list.GetSelection()
+        index = self.selected_index()
         if index != wx.NOT_FOUND:
             equation, _ = self.results[index]
             self.equation.SetValue(equation)
             self.equation.SetFocus()
             self.equation.SetInsertionPointEnd()
-            self.editing_index = index
+            self.editing_id = self.results.entry_id(index)
 
     def on_view_result(self, event):
-        index = self.result_list.GetSelection()
+        index = self.selected_index()
         if index != wx.NOT_FOUND:
             _, result = self.results[index]
+            if self.replaying:
+                print(f"Replay: would view {format_result(result)}")
+                return
             ResultViewerDialog(self, result)
 
     def on_copy_full(self, event):
-        index = self.result_list.GetSelection()
+        index = self.selected_index()
         if index != wx.NOT_FOUND:
             equation, result = self.results[index]
-            self.copy_to_clipboard(f"{equation} = {result}")
+            self.expand_result(result, lambda text: self.copy_to_clipboard(f"{equation} = {text}"))
 
     def on_copy_result(self, event):
-        index = self.result_list.GetSelection()
+        index = self.selected_index()
         if index != wx.NOT_FOUND:
             _, result = self.results[index]
-            self.copy_to_clipboard(result)
+            self.expand_result(result, self.copy_to_clipboard)
+
+    def expand_result(self, result, callback):
+        """Calls callback with all digits of result, converting huge numbers in a background thread."""
+        if not is_large_result(result):
+            callback(full_result_text(result))
+            return
+        print("Expanding large result in the background")
+        self.statusbar.SetStatusText("Calculating all digits...", 0)
+
+        def expand():
+            text = full_result_text(result)
+            wx.CallAfter(self.clear_statusbar)
+            wx.CallAfter(callback, text)
+
+        threading.Thread(target=expand, daemon=True).start()
 
     def on_delete_item(self, event):
-        index = self.result_list.GetSelection()
-        if index != wx.NOT_FOUND:
-            del self.results[index]
+        entry_ids = [self.results.entry_id(index) for index in self.result_list.GetSelections()]
+        if entry_ids:
+            for entry_id in entry_ids:
+                self.history.delete(entry_id)
             self.update_result_list()
-            self.save_results()
+
+    def selected_index(self):
+        selections = self.result_list.GetSelections()
+        return selections[0] if selections else wx.NOT_FOUND
+
+    def selection_summary(self):
+        """Statistics of the selected results, or of the whole history if fewer than two are selected."""
+        selections = self.result_list.GetSelections()
+        if len(selections) > 1:
+            return f"{len(selections)} selected", summarize_results(self.results[index][1] for index in selections)
+        return "All results", self.results.summary()
+
+    def on_selection_changed(self, event):
+        if len(self.result_list.GetSelections()) > 1:
+            try:
+                title, summary = self.selection_summary()
+                self.statusbar.SetStatusText(f"{title}: sum {summary['sum']:.12g}, mean {summary['mean']:.12g}", 0)
+            except ValueError:
+                self.statusbar.SetStatusText("No numeric results selected.", 0)
+        event.Skip()
+
+    def on_statistics(self, event):
+        try:
+            title, summary = self.selection_summary()
+        except ValueError as e:
+            self.show_message(self.get_user_friendly_error(str(e)), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        lines = [f"{title}: {summary['count']} numeric results"]
+        for name in ('sum', 'mean', 'min', 'max', 'stdev'):
+            if summary[name] is not None:
+                lines.append(f"{name.capitalize()}: {summary[name]:.12g}")
+        self.show_message("\n".join(lines), "Statistics", wx.OK | wx.ICON_INFORMATION)
 
     def on_clear_all(self, event):
-        self.results.clear()
+        self.history.clear()
         self.update_result_list()
-        self.save_results()
+
+    def on_export(self, event):
+        with wx.FileDialog(self, "Export History", wildcard=HISTORY_FILE_WILDCARD,
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            file_path = dialog.GetPath()
+        print(f"Exporting history to {file_path}")
+        entries = self.results.snapshot()
+
+        def export():
+            try:
+                count = export_history(entries, file_path,
+                                       lambda count: wx.CallAfter(self.statusbar.SetStatusText, f"Exported {count} results...", 0))
+            except OSError as e:
+                print(f"Error exporting history: {e}")
+                wx.CallAfter(self.show_message, f"Could not export the history: {e.strerror}", "Error", wx.OK | wx.ICON_ERROR)
+                wx.CallAfter(self.clear_statusbar)
+                return
+            wx.CallAfter(self.statusbar.SetStatusText, f"Exported {count} results.", 0)
+
+        threading.Thread(target=export, daemon=True).start()
+
+    def on_import(self, event):
+        with wx.FileDialog(self, "Import History", wildcard=HISTORY_FILE_WILDCARD,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            file_path = dialog.GetPath()
+        print(f"Importing history from {file_path}")
+        self.statusbar.SetStatusText("Importing results...", 0)
+        max_results = self.history.max_results
+
+        def read():
+            try:
+                rows = read_history_rows(file_path)
+                if max_results is not None:
+                    # Only the newest rows would survive the history limit anyway.
+                    rows = collections.deque(rows, maxlen=max_results)
+                rows = iter(rows)
+                count = 0
+                while True:
+                    chunk = list(itertools.islice(rows, EXPORT_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    wx.CallAfter(self.history.add_many, chunk)
+                    count += len(chunk)
+            except (OSError, ValueError, KeyError, TypeError, csv.Error) as e:
+                print(f"Error importing history: {e}")
+                wx.CallAfter(self.show_message, "Could not import the history. Please choose a file exported by this calculator.",
+                             "Error", wx.OK | wx.ICON_ERROR)
+                wx.CallAfter(self.clear_statusbar)
+                return
+            wx.CallAfter(self.update_result_list)
+            wx.CallAfter(self.statusbar.SetStatusText, f"Imported {count} results as the newest results.", 0)
+
+        threading.Thread(target=read, daemon=True).start()
 
     def copy_to_clipboard(self, text):
         if wx.TheClipboard.Open():
@@ -469,27 +2340,94 @@ class AccessibleCalculator(wx.Frame):
     def clear_statusbar(self):
         self.statusbar.SetStatusText("", 0)
 
-    def save_results(self):
-        print("Saving results")
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, 'calculator_results.pkl')
-        with open(file_path, 'wb') as f:
-            pickle.dump(self.results, f)
+    @property
+    def results(self):
+        return self.history.entries
 
     def load_results(self):
         print("Loading results")
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, 'calculator_results.pkl')
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'rb') as f:
-                    self.results = pickle.load(f)
-            except (pickle.UnpicklingError, EOFError):
-                self.results = []
-        print(f"Loaded results: {self.results}")
+        self.history.sync()
+        print(f"Loaded {len(self.results)} results using about {self.results.memory_usage() // 1024} KiB")
+
+    def on_history_changed(self):
+        """Merges results added by other running instances into the list."""
+        if self.history.sync():
+            print("Results changed in another instance")
+            selections = self.result_list.GetSelections()
+            # Rows moved in place keep their own selection; a rebuilt list gets it back by position.
+            if self.update_result_list():
+                for index in selections:
+                    if index < self.result_list.GetCount():
+                        self.result_list.SetSelection(index)
+
+    def show_message(self, message, caption, style):
+        """wx.MessageBox, except while replaying recorded input, when nobody is there to close it."""
+        if self.replaying:
+            print(f"Replay: {caption}: {message}")
+            return
+        wx.MessageBox(message, caption, style)
+
+    def toggle_recording(self, event=None):
+        if self.recorder is None:
+            print("Recording input")
+            self.recorder = InputRecorder()
+            self.statusbar.SetStatusText("Recording input. Press Ctrl+Shift+R again to stop.", 0)
+            return
+        recorder = self.recorder
+        self.recorder = None
+        print(f"Stopped recording after {len(recorder.steps)} steps")
+        self.clear_statusbar()
+        with wx.FileDialog(self, "Save Recording", wildcard=RECORDING_WILDCARD,
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() == wx.ID_OK:
+                recorder.save(dialog.GetPath())
+
+    def on_replay(self, event):
+        with wx.FileDialog(self, "Replay Recording", wildcard=RECORDING_WILDCARD,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            file_path = dialog.GetPath()
+        summary = self.replay(file_path)
+        self.show_message(summary, "Replay", wx.OK | wx.ICON_INFORMATION)
+
+    def replay(self, file_path, repeat=1, scratch=True):
+        """Replays a recording, writes the per-step latencies next to it and returns a summary.
+
+        With scratch, the replay works on a temporary copy of the history, so
+        recorded deletes and clears never reach the shared results file.
+        """
+        if self.recorder is not None:
+            self.toggle_recording()
+        steps = load_recording(file_path) * repeat
+        print(f"Replaying {len(steps)} steps from {file_path}")
+        history = self.history
+        if scratch:
+            directory = tempfile.mkdtemp(prefix='calculator_replay')
+            self.history = HistoryStore(os.path.join(directory, HISTORY_FILE_NAME), history.max_results)
+            self.history.add_many((entry.equation, entry.result, entry.timestamp, entry.mode)
+                                  for entry in history.entries.oldest_first())
+        try:
+            report = InputReplayer(self, steps).run()
+        finally:
+            if scratch:
+                self.history = history
+                self.editing_id = None
+                shutil.rmtree(directory, ignore_errors=True)
+                self.update_result_list()
+        write_latency_report(report, os.path.splitext(file_path)[0] + '.latency.csv')
+        summary = latency_summary(report)
+        print(summary)
+        return summary
+
+    def replay_and_exit(self, file_path, repeat, scratch):
+        self.replay(file_path, repeat, scratch)
+        self.Close()
 
     def show_help(self):
         print("Showing help dialog")
+        if self.replaying:
+            return
         help_dialog = HelpDialog(self)
         help_dialog.ShowModal()
         help_dialog.Destroy()
@@ -503,6 +2441,15 @@ class AccessibleCalculator(wx.Frame):
         self.equation.SetFocus()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Accessible Calculator")
+    parser.add_argument('--history', help="results file to use instead of the shared one")
+    parser.add_argument('--replay', help="replay a recorded input file, print the latencies and exit")
+    parser.add_argument('--repeat', type=int, default=1, help="number of times to replay the recording")
+    args = parser.parse_args()
+
     app = wx.App()
-    frame = AccessibleCalculator()
+    frame = AccessibleCalculator(history_path=args.history)
+    if args.replay:
+        # A replay only writes to the results file when one is given with --history.
+        wx.CallAfter(frame.replay_and_exit, args.replay, args.repeat, args.history is None)
     app.MainLoop()
\ No newline at end of file